@@ -0,0 +1,80 @@
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def nb_partition(a, k):
+    """
+    gets a 1d array and an index k
+
+    returns the k-th smallest value of the array using quickselect (the array is reordered in place)
+    """
+    lo = 0
+    hi = a.shape[0] - 1
+    while lo < hi:
+        pivot = a[(lo + hi) // 2]
+        i = lo
+        j = hi
+        while i <= j:
+            while a[i] < pivot:
+                i += 1
+            while a[j] > pivot:
+                j -= 1
+            if i <= j:
+                tmp = a[i]
+                a[i] = a[j]
+                a[j] = tmp
+                i += 1
+                j -= 1
+        if k <= j:
+            hi = j
+        elif k >= i:
+            lo = i
+        else:
+            return a[k]
+    return a[k]
+
+
+# only contract/reassoc: the data can hold NaN, which has to propagate through the weighted sum
+@njit(cache=True, fastmath={'contract', 'reassoc'}, parallel=True)
+def knn_batch(V, cols, ts, K, out):
+    """
+    gets the sample values as a float64 (rows, time points) array, the time points of its columns, an array of time points to interpolate, K
+    and a pre-allocated (rows, len(ts)) output array
+
+    fills out with the KNN interpolation (Epanechnikov kernel) of every requested time point, same result as knn_interpolation_batch
+    """
+    n_rows = V.shape[0]
+    n_cols = cols.shape[0]
+    if K >= n_cols - 1:
+        raise ValueError("K must be smaller than the number of time points minus one")
+
+    for i in prange(ts.shape[0]):
+        t = ts[i]
+        dist = np.empty(n_cols)
+        for c in range(n_cols):
+            dist[c] = abs(cols[c] - t)
+        # the bandwidth is the distance to the K-th closest time point (the first column is left out of this)
+        scratch = dist[1:].copy()
+        b = nb_partition(scratch, K)
+
+        total_kernel_weight = 0.0
+        for c in range(n_cols):
+            if cols[c] - b <= t and t <= cols[c] + b:
+                ker_norm = (t - cols[c]) / b
+                total_kernel_weight += 0.75 * (1.0 - ker_norm * ker_norm)
+
+        # Divide the weighted sum by the sum of weights, time points without any weight are left at zero
+        for r in range(n_rows):
+            out[r, i] = 0.0
+        if total_kernel_weight > 0:
+            for c in range(n_cols):
+                if cols[c] - b <= t and t <= cols[c] + b:
+                    ker_norm = (t - cols[c]) / b
+                    kernel = 0.75 * (1.0 - ker_norm * ker_norm)
+                    for r in range(n_rows):
+                        out[r, i] += kernel * V[r, c]
+            for r in range(n_rows):
+                out[r, i] /= total_kernel_weight
+
+    return out
@@ -1,48 +1,85 @@
 import pandas as pd
 import numpy as np
-import scipy
-import copy
-import sklearn
-from sklearn import linear_model
-import seaborn as sns
-import matplotlib.pyplot as plt
-import datetime
 
+try:
+    # numexpr evaluates the kernel formula in one multi-threaded pass, without temporaries
+    import numexpr as ne
+except ImportError:
+    ne = None
 
-def knn_interpolation(samples, time_point_to_complete, K):
+
+def knn_interpolation(samples, time_point_to_complete, K, cols_float=None):
     """
     gets a list of all samples (as a dataframe. the columns names shoul be the timepoints), a time point to interpolate and K
+    cols_float can be given as the column time points already parsed to floats, so they are not parsed again on every call
 
     returns an interpolation of the data point using KNN kernel with Epanechnikov function
     """
-    all_time_points = (list(samples.columns))
-    all_time_points.pop(0)
-    samples_dist = [float(time_point) - float(time_point_to_complete) for time_point in all_time_points]
-    samples_dist = np.abs(samples_dist)
-    samples_dist.sort()
-    b = samples_dist[K]
-
-    time_point_interpolated = None
-    total_kernel_weight = 0.0 # ADDED: to keep track of the sum of weights
-
-    for i in range(samples.shape[1]):
-        sample = float(samples.columns[i])
-        if sample - b <= time_point_to_complete and time_point_to_complete <= sample + b:
-            ker_norm = (time_point_to_complete - sample) / b
-            kernel = 0.75 * (1 - (ker_norm ** 2))
-            
-            total_kernel_weight += kernel # ADDED: Accumulate the sum of weights
-            
-            if type(time_point_interpolated) == np.ndarray:
-                time_point_interpolated += kernel * np.array(samples.iloc[:, i])
-            else:
-                time_point_interpolated = kernel * np.array(samples.iloc[:, i])
-
-    # ADDED: Divide the weighted sum by the sum of weights to get the average
-    if time_point_interpolated is not None and total_kernel_weight > 0:
-        weighted_average = time_point_interpolated / total_kernel_weight
+    if cols_float is None:
+        cols_float = np.asarray(samples.columns, dtype=np.float64)
+    values = samples.to_numpy(copy=False)
+
+    samples_dist = np.abs(cols_float - time_point_to_complete)
+    # the bandwidth is the distance to the K-th closest time point (the first column is left out of this)
+    b = np.partition(samples_dist[1:], K)[K]
+
+    # only the columns within the bandwidth are weighted: the K+1 nearest, the first column when it is
+    # close enough and any column tied at distance b (those get weight 0, but a NaN there still propagates).
+    # The test is sample - b <= t <= sample + b, as |t - sample| <= b rounds differently at the edge.
+    nearest = np.flatnonzero((cols_float - b <= time_point_to_complete) &
+                             (time_point_to_complete <= cols_float + b))
+    ker_norm = (time_point_to_complete - cols_float[nearest]) / b
+    kernel = 0.75 * (1 - ker_norm * ker_norm)
+    total_kernel_weight = kernel.sum()
+
+    # Divide the weighted sum by the sum of weights to get the average
+    if total_kernel_weight > 0:
+        weighted_average = (values[:, nearest] @ kernel) / total_kernel_weight
     else:
         weighted_average = np.zeros(samples.shape[0])
         
     return weighted_average
 
+
+def knn_interpolation_batch(V, cols_float, t_array, K):
+    """
+    gets the sample values as a (rows, time points) array, the time points of its columns as floats, an array of time points to interpolate and K
+
+    returns a (rows, len(t_array)) array with the KNN interpolation (Epanechnikov kernel) of every requested time point
+    """
+    t_array = np.asarray(t_array, dtype=np.float64)
+
+    D = np.abs(cols_float[None, :] - t_array[:, None])
+    # one bandwidth per requested time point (the first column is left out, as in knn_interpolation)
+    b = np.partition(D[:, 1:], K, axis=1)[:, K]
+
+    # the columns within the bandwidth of every time point (same set as in knn_interpolation), packed
+    # into a (T, W) index array, W being the largest number of such columns (about K+2); M marks the used slots
+    in_bandwidth = ((cols_float[None, :] - b[:, None] <= t_array[:, None]) &
+                    (t_array[:, None] <= cols_float[None, :] + b[:, None]))
+    t_idx, c_idx = np.nonzero(in_bandwidth)
+    counts = np.bincount(t_idx, minlength=len(t_array))
+    slot = np.arange(len(t_idx)) - np.repeat(np.cumsum(counts) - counts, counts)
+    nearest = np.zeros((len(t_array), counts.max()), dtype=np.intp)
+    M = np.zeros(nearest.shape, dtype=bool)
+    nearest[t_idx, slot] = c_idx
+    M[t_idx, slot] = True
+    cols_k = cols_float[nearest]
+    if ne is not None:
+        ker = ne.evaluate("where(M, 0.75 * (1.0 - ((ts - cols) / b) ** 2), 0.0)",
+                          local_dict={'M': M, 'ts': t_array[:, None], 'cols': cols_k, 'b': b[:, None]})
+    else:
+        ker = 0.75 * (1 - ((t_array[:, None] - cols_k) / b[:, None]) ** 2) * M
+    total_kernel_weight = ker.sum(axis=1)
+
+    # Accumulate the weighted sums one slot at a time, the unused slots never touch V
+    weighted_sum = np.zeros((V.shape[0], len(t_array)))
+    for k in range(nearest.shape[1]):
+        used = M[:, k]
+        weighted_sum[:, used] += V[:, nearest[used, k]] * ker[used, k]
+
+    # Divide the weighted sums by the sum of weights, time points without any weight are left at zero
+    weighted_average = np.zeros_like(weighted_sum)
+    np.divide(weighted_sum, total_kernel_weight, out=weighted_average, where=total_kernel_weight > 0)
+
+    return weighted_average
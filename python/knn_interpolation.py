@@ -1,7 +1,16 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pandas as pd
 import numpy as np
-from interpolation_methods import knn_interpolation
+import interpolation_methods
+from interpolation_methods import knn_interpolation_batch
+
+try:
+    # Use the compiled interpolation kernel when numba is installed
+    from interpolation_kernels import knn_batch
+except ImportError:
+    knn_batch = None
 
 # --- 1. CONFIGURE YOUR SCRIPT ---
 # TODO: Update these paths to match your folder locations.
@@ -16,91 +25,138 @@ new_time_interval = 7.0
 K = 5
 # --------------------------------
 
+
+def init_worker():
+    """
+    Limits numba and numexpr to one thread in each pool worker, the pool itself already uses every core.
+    """
+    if knn_batch is not None:
+        import numba
+        numba.set_num_threads(1)
+    if interpolation_methods.ne is not None:
+        interpolation_methods.ne.set_num_threads(1)
+
+
+def process_file(filename, input_folder, output_folder, new_time_interval, K):
+    """
+    Regularizes a single .tsv abundance table from input_folder onto a grid with
+    new_time_interval spacing and saves it under the same name in output_folder.
+    """
+    print(f"\nProcessing {filename}...")
+    file_path = os.path.join(input_folder, filename)
+
+    # --- Repeated column names: the pyarrow parser keeps two '7' columns while the default parser
+    # renames the second one to '7.1' (which would then be used as a real time point), so the
+    # result would depend on the parser. Such files are skipped instead ---
+    with open(file_path, encoding='utf-8-sig') as f:
+        header = pd.Index([name.strip('"') for name in f.readline().rstrip('\r\n').split('\t')])
+    repeated = header[header.duplicated() & (header != '')].unique()
+    if len(repeated) > 0:
+        print(f"  - SKIPPING: Repeated column names in {filename}: {', '.join(repeated)}")
+        return
+    # -----------------------------------------------------------------
+
+    # Load the irregularly sampled data from the .tsv file
+    # (the pyarrow parser is much faster on wide tables, use the default parser if it is not available
+    # or fails on the file for any reason; its errors are not all ValueErrors)
+    try:
+        irregular_data = pd.read_csv(file_path, sep='\t', index_col=0, engine='pyarrow')
+    except Exception:
+        irregular_data = pd.read_csv(file_path, sep='\t', index_col=0, low_memory=False)
+
+    # --- Data Cleaning: Keep only columns with valid numeric names ---
+    coerced = pd.to_numeric(irregular_data.columns, errors='coerce')
+    mask = ~np.isnan(coerced)
+    for col in irregular_data.columns[~mask]:
+        print(f"  - Ignoring non-numeric column: '{col}'")
+    
+    irregular_data = irregular_data.loc[:, mask]
+    # -----------------------------------------------------------------
+    
+    # Get original time points as floats (parsed once and reused below)
+    cols_float = np.asarray(coerced[mask], dtype=np.float64)
+
+    if cols_float.size == 0:
+        print(f"  - SKIPPING: No valid time point columns found in {filename}.")
+        return
+
+    # --- MODIFIED LOGIC ---
+    # 1. Determine the target regular time grid
+    start_time = cols_float.min()
+    end_time = cols_float.max()
+    
+    # Generate the sequence of regular dates using numpy for precision
+    regular_time_points = np.arange(start_time, end_time + new_time_interval, new_time_interval)
+
+    # Convert the table to NumPy once instead of once per new time point
+    V = irregular_data.to_numpy()
+
+    # Fill a pre-allocated buffer with the regularized data, the DataFrame is built once at the end
+    out = np.empty((irregular_data.shape[0], len(regular_time_points)))
+    columns_to_interpolate = []
+
+    # Use a tolerance (isclose) for floating point comparison to find, for every point
+    # in the regular grid, the first original time point that is very similar (-1 if none is)
+    close = np.isclose(cols_float[None, :], regular_time_points[:, None])
+    match_idx = np.where(close.any(axis=1), close.argmax(axis=1), -1)
+
+    # 2. For each point in the regular grid, decide whether to copy or interpolate
+    for j, t in enumerate(regular_time_points):
+        if match_idx[j] >= 0:
+            # An original data point exists at this time, so we use it directly.
+            print(f"  - Using original data for time point: {t:.2f}")
+            out[:, j] = V[:, match_idx[j]]
+        else:
+            # No data point exists, so we interpolate.
+            print(f"  - Interpolating for new time point: {t:.2f}")
+            columns_to_interpolate.append(j)
+
+    # 3. Interpolate all the missing time points in a single call
+    if columns_to_interpolate:
+        t_array = regular_time_points[columns_to_interpolate]
+        if knn_batch is not None:
+            interpolated = np.empty((V.shape[0], len(t_array)))
+            knn_batch(np.ascontiguousarray(V, dtype=np.float64), cols_float, t_array, K, interpolated)
+        else:
+            interpolated = knn_interpolation_batch(V, cols_float, t_array, K)
+        out[:, columns_to_interpolate] = interpolated
+
+    # Create the DataFrame with the regularized data
+    regular_data = pd.DataFrame(out, index=irregular_data.index, columns=regular_time_points)
+
+    # --- END OF MODIFIED LOGIC ---
+
+    # Construct the path for the output file
+    output_filepath = os.path.join(output_folder, filename)
+
+    # Save the new, regularly sampled DataFrame to a .tsv file
+    regular_data.to_csv(output_filepath, sep='\t')
+    print(f"Finished processing {filename}. Saved to {output_filepath}")
+
+
 # --- Script execution starts here ---
 
-# Create the output folder if it doesn't exist
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-    print(f"Created output folder: {output_folder}")
-
-# Check if the input folder exists
-if not os.path.exists(input_folder):
-    print(f"ERROR: Input folder not found at {input_folder}")
-    print("Please update the 'input_folder' variable in this script.")
-else:
-    # Get a list of all the .tsv files in the input folder
-    files_to_process = [f for f in os.listdir(input_folder) if f.endswith('.tsv')]
-
-    if not files_to_process:
-        print(f"No .tsv files found in {input_folder}")
+if __name__ == '__main__':
+    # Create the output folder if it doesn't exist
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+        print(f"Created output folder: {output_folder}")
+
+    # Check if the input folder exists
+    if not os.path.exists(input_folder):
+        print(f"ERROR: Input folder not found at {input_folder}")
+        print("Please update the 'input_folder' variable in this script.")
     else:
-        # Process each file
-        for filename in files_to_process:
-            print(f"\nProcessing {filename}...")
-            file_path = os.path.join(input_folder, filename)
-
-            # Load the irregularly sampled data from the .tsv file
-            irregular_data = pd.read_csv(file_path, sep='\t', index_col=0, low_memory=False)
-
-            # --- Data Cleaning: Keep only columns with valid numeric names ---
-            valid_numeric_columns = []
-            for col in irregular_data.columns:
-                try:
-                    float(col)
-                    valid_numeric_columns.append(col)
-                except ValueError:
-                    print(f"  - Ignoring non-numeric column: '{col}'")
-            
-            irregular_data = irregular_data[valid_numeric_columns]
-            # -----------------------------------------------------------------
-            
-            # Get original time points as floats
-            original_time_points = [float(col) for col in irregular_data.columns]
-
-            if not original_time_points:
-                print(f"  - SKIPPING: No valid time point columns found in {filename}.")
-                continue
-
-            # --- MODIFIED LOGIC ---
-            # 1. Determine the target regular time grid
-            start_time = min(original_time_points)
-            end_time = max(original_time_points)
-            
-            # Generate the sequence of regular dates using numpy for precision
-            regular_time_points = np.arange(start_time, end_time + new_time_interval, new_time_interval)
-
-            # Create a new DataFrame to store the regularized data
-            regular_data = pd.DataFrame(index=irregular_data.index)
-            
-            # For quick lookups, create a set of the original time points
-            original_times_set = set(original_time_points)
-
-            # 2. For each point in the regular grid, decide whether to copy or interpolate
-            for t in regular_time_points:
-                # Use a tolerance (isclose) for floating point comparison
-                # to see if a very similar time point already exists.
-                existing_match = next((ot for ot in original_time_points if np.isclose(ot, t)), None)
-
-                if existing_match is not None:
-                    # An original data point exists at this time, so we use it directly.
-                    print(f"  - Using original data for time point: {t:.2f}")
-                    # Find the original column name (as a string) for the float value
-                    original_col_name = str(existing_match)
-                    if original_col_name.endswith('.0'): # Handle cases like '14.0'
-                        original_col_name = original_col_name[:-2]
-                    regular_data[t] = irregular_data[original_col_name]
-                else:
-                    # No data point exists, so we interpolate.
-                    print(f"  - Interpolating for new time point: {t:.2f}")
-                    regular_data[t] = knn_interpolation(irregular_data, t, K)
-
-            # --- END OF MODIFIED LOGIC ---
-
-            # Construct the path for the output file
-            output_filepath = os.path.join(output_folder, filename)
-
-            # Save the new, regularly sampled DataFrame to a .tsv file
-            regular_data.to_csv(output_filepath, sep='\t')
-            print(f"Finished processing {filename}. Saved to {output_filepath}")
-
-        print("\nAll files have been processed!")
+        # Get a list of all the .tsv files in the input folder
+        files_to_process = [f for f in os.listdir(input_folder) if f.endswith('.tsv')]
+
+        if not files_to_process:
+            print(f"No .tsv files found in {input_folder}")
+        else:
+            # Process the files in parallel, each file is independent of the others
+            # (one file per core, with single-threaded kernels inside each worker)
+            with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_worker) as ex:
+                list(ex.map(process_file, files_to_process, repeat(input_folder), repeat(output_folder),
+                            repeat(new_time_interval), repeat(K), chunksize=1))
+
+            print("\nAll files have been processed!")
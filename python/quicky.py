@@ -39,11 +39,39 @@ interpolated_column = knn_interpolation(sample_data, time_to_interpolate, K)
 
 # --- 4. Display the Results ---
 # We add the new, interpolated column to our original DataFrame to see the result.
-# Note: The function returns a NumPy array, so we convert it to a pandas Series.
-sample_data[str(time_to_interpolate)] = pd.Series(interpolated_column, index=sample_data.index)
-
-# Sort the columns by time point to make the final table easy to read.
-final_data = sample_data.reindex(sorted(sample_data.columns, key=float), axis=1)
+# The original columns are already in time order, so the new column is inserted
+# at its sorted position and the final table stays easy to read.
+insert_pos = int(np.searchsorted(np.asarray(sample_data.columns, dtype=float), time_to_interpolate))
+sample_data.insert(insert_pos, str(time_to_interpolate), interpolated_column)
+final_data = sample_data
 
 print("\n--- Data with Interpolated Column ---")
 print(final_data)
+
+
+# --- 5. Check the batch implementations ---
+# The batch function (and the numba kernel, when numba is installed) must give the same
+# result as knn_interpolation, also when a row has a missing value (NaN). Here the first
+# time point of Microbe A is missing but lies far outside the bandwidth, so it must not
+# turn the interpolated value into NaN.
+from interpolation_methods import knn_interpolation_batch
+
+nan_data = pd.DataFrame({'0': [np.nan, 1.], '100': [1., 1.], '101': [1., 1.], '103': [1., 1.],
+                         '106': [1., 1.], '110': [1., 1.], '111': [1., 1.]}, index=index)
+nan_time_points = nan_data.columns.astype(float).to_numpy()
+check_times = np.array([104.5, 102.0, 108.0])
+
+expected = np.column_stack([knn_interpolation(nan_data, t, K) for t in check_times])
+batch = knn_interpolation_batch(nan_data.to_numpy(), nan_time_points, check_times, K)
+np.testing.assert_allclose(batch, expected, equal_nan=True)
+
+try:
+    from interpolation_kernels import knn_batch
+except ImportError:
+    knn_batch = None
+if knn_batch is not None:
+    compiled = knn_batch(nan_data.to_numpy(), nan_time_points, check_times, K, np.empty(expected.shape))
+    np.testing.assert_allclose(compiled, expected, equal_nan=True)
+
+print("\n--- Batch interpolation matches knn_interpolation (with a missing value) ---")
+print(pd.DataFrame(batch, index=index, columns=check_times))
@@ -4,6 +4,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from wavepal import Wavepal
 import os
+from types import SimpleNamespace
 
 # --- Configuration ---
 # TODO: UPDATE THESE PATHS TO MATCH YOUR FILE LOCATIONS
@@ -53,9 +54,44 @@ def main():
         #'freq_min_bound': False
     }
 
-    for index, row in pairings_df.iterrows():
-        var_x = str(row['X'])
-        var_y = str(row['Y'])
+    print((time_points[-1]-time_points[0]))
+    print(1/(time_points[-1]-time_points[0]))
+
+    # The analysis of a variable only depends on its own time series, so it is run once
+    # per variable and reused for every pair the variable appears in (None if it failed).
+    # Only the arrays used by the plots are kept, so the Wavepal object itself is freed,
+    # and they are dropped after the last pair that uses the variable.
+    analyzed = {}
+    pairs = list(zip(pairings_df['X'].astype(str).to_numpy(), pairings_df['Y'].astype(str).to_numpy()))
+    last_pair = {}
+    for k, (var_x, var_y) in enumerate(pairs):
+        if var_x in ts_df.index and var_y in ts_df.index:
+            last_pair[var_x] = k
+            last_pair[var_y] = k
+
+    def analyze(var):
+        if var in analyzed:
+            return analyzed[var]
+
+        # --- MODIFIED: Added carma_params() to enable confidence level calculation ---
+        print("  Analyzing {0}...".format(var))
+        value = ts_df.loc[var].values.astype(float)
+        wp = Wavepal(time_points, value)
+        wp.check_data()
+        wp.choose_trend_degree(pol_degree=-1)
+        wp.trend_vectors()
+        wp.carma_params(p=1, q=0, signif_level_type='a') # Analytical confidence levels for CAR(1,0) noise
+        wp.freq_analysis(**ANALYSIS_PARAMS)
+        # --- END OF MODIFICATION ---
+
+        if wp.run_freq_analysis:
+            analyzed[var] = SimpleNamespace(freq=wp.freq, periodogram=wp.periodogram,
+                                            periodogram_cl_anal=wp.periodogram_cl_anal)
+        else:
+            analyzed[var] = None
+        return analyzed[var]
+
+    for k, (var_x, var_y) in enumerate(pairs):
 
         print("\nProcessing pair: {0} and {1}...".format(var_x, var_y))
 
@@ -64,41 +100,28 @@ def main():
             print("  (Looking for '{0}' and '{1}' in the time series index)".format(var_x, var_y))
             continue
 
-        value_x = ts_df.loc[var_x].values.astype(float)
-        value_y = ts_df.loc[var_y].values.astype(float)
+        wp_x = analyze(var_x)
+        wp_y = analyze(var_y)
+        for var in (var_x, var_y):
+            if last_pair[var] == k:
+                analyzed.pop(var, None)
         
-       # --- MODIFIED: Added carma_params() to enable confidence level calculation ---
-        print("  Analyzing {0}...".format(var_x))
-        print((time_points[-1]-time_points[0]))
-        print(1/(time_points[-1]-time_points[0]))
-        wp_x = Wavepal(time_points, value_x) 
-        wp_x.check_data()
-        wp_x.choose_trend_degree(pol_degree=-1)
-        wp_x.trend_vectors()
-        wp_x.carma_params(p=1, q=0, signif_level_type='a') # Analytical confidence levels for CAR(1,0) noise
-        wp_x.freq_analysis(**ANALYSIS_PARAMS)
-
-        print("  Analyzing {0}...".format(var_y))
-        wp_y = Wavepal(time_points, value_y)
-        wp_y.check_data()
-        wp_y.choose_trend_degree(pol_degree=-1)
-        wp_y.trend_vectors()
-        wp_y.carma_params(p=1, q=0, signif_level_type='a')
-        wp_y.freq_analysis(**ANALYSIS_PARAMS)
-        # --- END OF MODIFICATION ---
-        
-        if not wp_x.run_freq_analysis or not wp_y.run_freq_analysis:
+        if wp_x is None or wp_y is None:
             print("  WARNING: Analysis failed for one or both variables. Skipping plot.")
             continue
 
         print("  Generating plot...")
         fig, axes = plt.subplots(nrows=2, ncols=1, figsize=(12, 10), sharex=True)
 
+        # Periods for the x-axis, computed once per variable
+        period_x = 1. / wp_x.freq
+        period_y = 1. / wp_y.freq
+
         # --- MODIFIED: Added confidence level plotting ---
         # For plot X
-        axes[0].plot(1. / wp_x.freq, wp_x.periodogram, color='black', label='Periodogram')
+        axes[0].plot(period_x, wp_x.periodogram, color='black', label='Periodogram')
         # Plot the first (and only) calculated confidence level
-        axes[0].plot(1. / wp_x.freq, wp_x.periodogram_cl_anal[:, 0], color='red', linestyle='--', label='95% Confidence Level')
+        axes[0].plot(period_x, wp_x.periodogram_cl_anal[:, 0], color='red', linestyle='--', label='95% Confidence Level')
         axes[0].set_title("Periodogram for: {0}".format(var_x), fontsize=14)
         axes[0].set_ylabel("Power", fontsize=12)
         #axes[0].set_xlim([15, 370])
@@ -106,8 +129,8 @@ def main():
         axes[0].legend()
 
         # For plot Y
-        axes[1].plot(1. / wp_y.freq, wp_y.periodogram, color='black', label='Periodogram')
-        axes[1].plot(1. / wp_y.freq, wp_y.periodogram_cl_anal[:, 0], color='red', linestyle='--', label='95% Confidence Level')
+        axes[1].plot(period_y, wp_y.periodogram, color='black', label='Periodogram')
+        axes[1].plot(period_y, wp_y.periodogram_cl_anal[:, 0], color='red', linestyle='--', label='95% Confidence Level')
         axes[1].set_title("Periodogram for: {0}".format(var_y), fontsize=14)
         axes[1].set_ylabel("Power", fontsize=12)
         axes[1].set_xlabel("Period (days)", fontsize=12)
@@ -2,8 +2,10 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
 from wavepal import Wavepal
 import os
+from types import SimpleNamespace
 
 # --- Configuration ---
 # TODO: UPDATE THESE PATHS TO MATCH YOUR FILE LOCATIONS
@@ -48,9 +50,39 @@ def main():
         'percentile': percentile
     }
 
-    for index, row in pairings_df.iterrows():
-        var_x = str(row['X'])
-        var_y = str(row['Y'])
+    # The analysis of a variable only depends on its own time series, so it is run once
+    # per variable and reused for every pair the variable appears in (None if it failed).
+    # Only the arrays used by the plots are kept, so the Wavepal object itself is freed,
+    # and they are dropped after the last pair that uses the variable.
+    analyzed = {}
+    pairs = list(zip(pairings_df['X'].astype(str).to_numpy(), pairings_df['Y'].astype(str).to_numpy()))
+    last_pair = {}
+    for k, (var_x, var_y) in enumerate(pairs):
+        if var_x in ts_df.index and var_y in ts_df.index:
+            last_pair[var_x] = k
+            last_pair[var_y] = k
+
+    def analyze(var):
+        if var in analyzed:
+            return analyzed[var]
+
+        print("  Analyzing {0}...".format(var))
+        value = ts_df.loc[var].values.astype(float)
+        wp = Wavepal(time_points, value)
+        #help(wp.timefreq_analysis)
+        wp.check_data()
+        wp.choose_trend_degree(pol_degree=-1)
+        wp.trend_vectors()
+        wp.timefreq_analysis(**ANALYSIS_PARAMS)
+
+        if wp.run_timefreq_analysis:
+            analyzed[var] = SimpleNamespace(theta=wp.theta, period_cwt=wp.period_cwt,
+                                            scalogram=wp.scalogram)
+        else:
+            analyzed[var] = None
+        return analyzed[var]
+
+    for k, (var_x, var_y) in enumerate(pairs):
 
         print("\nProcessing pair: {0} and {1}...".format(var_x, var_y))
 
@@ -59,25 +91,13 @@ def main():
             print("  (Looking for '{0}' and '{1}' in the time series index)".format(var_x, var_y))
             continue
 
-        value_x = ts_df.loc[var_x].values.astype(float)
-        value_y = ts_df.loc[var_y].values.astype(float)
+        wp_x = analyze(var_x)
+        wp_y = analyze(var_y)
+        for var in (var_x, var_y):
+            if last_pair[var] == k:
+                analyzed.pop(var, None)
         
-        print("  Analyzing {0}...".format(var_x))
-        wp_x = Wavepal(time_points, value_x) 
-        #help(wp_x.timefreq_analysis)
-        wp_x.check_data()
-        wp_x.choose_trend_degree(pol_degree=-1)
-        wp_x.trend_vectors()
-        wp_x.timefreq_analysis(**ANALYSIS_PARAMS)
-
-        print("  Analyzing {0}...".format(var_y))
-        wp_y = Wavepal(time_points, value_y)
-        wp_y.check_data()
-        wp_y.choose_trend_degree(pol_degree=-1)
-        wp_y.trend_vectors()
-        wp_y.timefreq_analysis(**ANALYSIS_PARAMS)
-        
-        if not wp_x.run_timefreq_analysis or not wp_y.run_timefreq_analysis:
+        if wp_x is None or wp_y is None:
             print("  WARNING: Analysis failed for one or both variables. Skipping plot.")
             continue
 
@@ -88,9 +108,9 @@ def main():
         # For plot X
         vmin_x = np.min(wp_x.scalogram)
         vmax_x = np.max(wp_x.scalogram)
-        levels_x = np.linspace(vmin_x, vmax_x, 100)
         # 1. Use the raw period values for the y-axis
-        axes[0].contourf(wp_x.theta, wp_x.period_cwt, np.transpose(wp_x.scalogram), levels=levels_x, cmap='viridis')
+        axes[0].pcolormesh(wp_x.theta, wp_x.period_cwt, wp_x.scalogram.T, cmap='viridis', shading='auto',
+                           norm=Normalize(vmin_x, vmax_x))
         # 2. Set the scale to logarithmic
         axes[0].set_yscale('log')
         axes[0].set_title("Wavelet Scalogram for: {0}".format(var_x), fontsize=14)
@@ -101,9 +121,9 @@ def main():
         # For plot Y
         vmin_y = np.min(wp_y.scalogram)
         vmax_y = np.max(wp_y.scalogram)
-        levels_y = np.linspace(vmin_y, vmax_y, 100)
         # 1. Use the raw period values for the y-axis
-        axes[1].contourf(wp_y.theta, wp_y.period_cwt, np.transpose(wp_y.scalogram), levels=levels_y, cmap='viridis')
+        axes[1].pcolormesh(wp_y.theta, wp_y.period_cwt, wp_y.scalogram.T, cmap='viridis', shading='auto',
+                           norm=Normalize(vmin_y, vmax_y))
         # 2. Set the scale to logarithmic
         axes[1].set_yscale('log')
         axes[1].set_title("Wavelet Scalogram for: {0}".format(var_y), fontsize=14)